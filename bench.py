@@ -0,0 +1,192 @@
+#!/usr/bin/python
+
+import Image
+import ImageDraw
+
+import engine
+import fitness
+import genome
+import history
+import metric
+import polygen
+import report
+import scheduler
+import stats
+import writer
+
+import getopt
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# (name, primitive, defaults) of each generator, as its entry point runs it.
+GENERATORS = (
+	('imagegen', 'circle', {}),
+	('rectgen', 'rectangle', {}),
+	('linegen', 'line', {}),
+	('polygen', 'polygon', polygen.DEFAULTS),
+	('qpolygen', 'polygon', {}),
+	)
+
+SIZES = ((64, 48), (128, 96), (256, 192))
+
+SEED = 1
+ITERATIONS = 2000
+# Every case is run this many times, in passes over them all so its runs are spread out, and its fastest kept, so a busy spell on the machine is not taken for a regression.
+REPEATS = 5
+TOLERANCE = 0.1
+
+def synthetic_target(size, seed):
+	"""Returns a reproducible target of overlapping ellipses on a flat background."""
+	rng = random.Random(seed)
+	image = Image.new('RGB', size, (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)))
+	draw = ImageDraw.Draw(image)
+	for index in range(size[0] * size[1] / 300 + 5):
+		x = rng.randint(0, size[0] - 1)
+		y = rng.randint(0, size[1] - 1)
+		w = rng.randint(3, size[0] / 3)
+		h = rng.randint(3, size[1] / 3)
+		draw.ellipse((x, y, x + w, y + h), fill=(rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)))
+	return image
+
+def run(shape, defaults, target_image, iterations, seed, measure='rgb'):
+	"""Runs engine.main's single-process search for a fixed number of iterations, checkpointing into the current directory, and returns its timings and score."""
+	random.seed(seed)
+	config = engine.default_config(shape, defaults)
+	config['generation'] = 0
+	config['METRIC'] = measure
+	# Charged by the clock, the scheduler would steer each run down a different path, so it is charged per candidate.
+	config['SCHEDULE_TIMED'] = False
+	target = fitness.Target(target_image, measure=metric.METRICS[measure])
+	log = history.HistoryLog('best.history')
+	page = report.Report()
+	current = engine.ImageOrganism(config, target.size, genome.Genome()).add_shape(target)
+	config['generation'] += 1
+	current.calc_score(target)
+	memo = fitness.ScoreCache(config['SCORE_CACHE_SIZE'])
+	memo.store(current.dna, current.score)
+	counters = stats.Stats('stats.json', config['STATS_INTERVAL'], memo)
+	checkpoints = writer.Writer(lambda state: engine.write_checkpoint(state, log, page, counters), engine.merge_checkpoints)
+	search = engine.Search(config, target, current, scheduler.Scheduler(current.mutation_names, config), memo, counters)
+	accepts = 0
+	start = time.time()
+	while search.x < iterations:
+		if search.step() != None:
+			mark = time.time()
+			checkpoints.submit(engine.checkpoint_state(config, search.current, search.current, search.x))
+			counters.add('accept', time.time() - mark)
+			accepts += 1
+	seconds = time.time() - start
+	checkpoints.close()
+	log.close()
+	return {
+		'iterations': iterations,
+		'seconds': seconds,
+		'iterations_per_second': float(iterations) / seconds,
+		'phases': counters.phases,
+		'accepts': accepts,
+		'shapes': len(search.current.dna),
+		'score': search.current.score,
+		'score_cache_hits': memo.hits,
+	}
+
+def compare(results, baseline, tolerance):
+	"""Prints each case's ratio to the baseline, and any change of score, and returns the names of those whose iterations/sec fell by more than tolerance."""
+	regressions = []
+	for name in sorted(results):
+		if name not in baseline:
+			print name + ': not in baseline'
+			continue
+		ratio = float(results[name]['iterations_per_second']) / baseline[name]['iterations_per_second']
+		line = name + ': ' + '%.2f' % ratio + 'x iterations/sec'
+		if results[name]['score'] != baseline[name]['score']:
+			line += ', score ' + str(baseline[name]['score']) + ' -> ' + str(results[name]['score'])
+		if ratio < 1 - tolerance:
+			line += ' REGRESSION'
+			regressions.append(name)
+		print line
+	return regressions
+
+def main(argv):
+	iterations = ITERATIONS
+	repeats = REPEATS
+	output = 'bench.json'
+	baseline = None
+	tolerance = TOLERANCE
+	measure = 'rgb'
+	try:
+		opts, args = getopt.getopt(argv, 'n:r:o:b:t:f:', ['iterations=', 'repeats=', 'output=', 'baseline=', 'tolerance=', 'metric='])
+	except getopt.GetoptError:
+		print 'invalid arg'
+		sys.exit(1)
+	if len(args) > 0:
+		print 'invalid args'
+		sys.exit(1)
+
+	for opt, arg in opts:
+		if opt in ('-n', '--iterations'):
+			iterations = int(arg)
+			if iterations < 1:
+				print 'invalid args'
+				sys.exit(1)
+		elif opt in ('-r', '--repeats'):
+			repeats = int(arg)
+			if repeats < 1:
+				print 'invalid args'
+				sys.exit(1)
+		elif opt in ('-o', '--output'):
+			output = arg
+		elif opt in ('-b', '--baseline'):
+			baseline = arg
+		elif opt in ('-t', '--tolerance'):
+			tolerance = float(arg)
+		elif opt in ('-f', '--metric'):
+			if arg not in metric.METRICS:
+				print 'invalid args'
+				sys.exit(1)
+			measure = arg
+
+	results = {}
+	directory = os.getcwd()
+	targets = [(size, synthetic_target(size, SEED)) for size in SIZES]
+	for repeat in range(repeats):
+		for size, target_image in targets:
+			for name, shape, defaults in GENERATORS:
+				case = name + '/' + str(size[0]) + 'x' + str(size[1])
+				scratch = tempfile.mkdtemp()
+				os.chdir(scratch)
+				try:
+					result = run(shape, defaults, target_image, iterations, SEED, measure)
+				finally:
+					os.chdir(directory)
+					shutil.rmtree(scratch)
+				if case not in results or result['seconds'] < results[case]['seconds']:
+					results[case] = result
+	for size in SIZES:
+		for name, shape, defaults in GENERATORS:
+			case = name + '/' + str(size[0]) + 'x' + str(size[1])
+			result = results[case]
+			print case + ': ' + '%.1f' % result['iterations_per_second'] + ' it/s, ' + \
+				', '.join([phase + ' ' + '%.0f%%' % (100 * result['phases'][phase] / result['seconds']) for phase in stats.PHASES]) + \
+				', score ' + str(result['score']) + ', ' + str(result['score_cache_hits']) + ' score cache hits'
+
+	f = open(output, 'w')
+	json.dump({'python': platform.python_version(), 'iterations': iterations, 'repeats': repeats, 'seed': SEED, 'metric': measure, 'results': results}, f, indent=1, sort_keys=True)
+	f.write('\n')
+	f.close()
+
+	if baseline != None:
+		f = open(baseline, 'r')
+		saved = json.load(f)
+		f.close()
+		print ''
+		if compare(results, saved['results'], tolerance):
+			sys.exit(1)
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
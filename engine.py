@@ -0,0 +1,931 @@
+#!/usr/bin/python
+
+import Image
+import ImageDraw
+
+import fitness
+import genome
+import history
+import metric
+import population
+import render
+import scheduler
+import report
+import shapes
+import stats
+import writer
+
+import getopt
+import hashlib
+import locale
+import multiprocessing
+import numpy
+import os
+import pickle
+import random
+import shutil
+import signal
+import sys
+import time
+
+class ImageOrganism:
+	"""An organism approximating an image with translucent shapes of config['SHAPE'], its DNA a Genome of ((r, g, b, a), [coordinates]) pairs."""
+
+	def __init__(self, config, size, dna, base=None, dirty=None, first=0, cache=None):
+		self.__score = -1
+		self.__config = config
+		self.__shape = shapes.SHAPES[config['SHAPE']]
+		self.__size = size 
+		self.__dna = dna
+		self.__image = None
+		self.__rows = None
+		self.__base = base
+		self.__dirty = dirty
+		self.__first = first
+		self.__region = None
+		self.__pixel_errors = None
+		if cache == None:
+			cache = render.LayerCache(config['CACHE_INTERVAL'], config['CACHE_SIZE'])
+		self.__cache = cache
+		self.__mutation = -1
+		self.__errors = None
+
+	def __get_dna(self):
+		return self.__dna
+
+	def __get_score(self):
+		return self.__score
+
+	def __get_size(self):
+		return self.__size
+
+	def __get_image(self):
+		self.__render()
+		return self.__image
+
+	def __get_changes(self):
+		if self.__base is None:
+			return None
+		return (self.__dirty, self.__first)
+
+	def __get_mutation_name(self):
+		if self.__mutation < 0:
+			return ''
+		return self.mutation_names[self.__mutation]
+
+	def __get_mutation_names(self):
+		return tuple([mutation.__name__[len('__mutation_'):] for mutation in self.__mutations] + [mutation.__name__[len('mutation_'):] for mutation in self.__shape.mutations])
+
+	dna = property(fget=__get_dna, doc="""DNA string.""")
+	score = property(fget=__get_score, doc="""Score of the picture.""")
+	size = property(fget=__get_size, doc="""Size of the picture. (width, height)""")
+	image = property(fget=__get_image, doc="""CIL Image""")
+	mutation_name = property(fget=__get_mutation_name, doc="""Last mutation name.""")
+	mutation_names = property(fget=__get_mutation_names, doc="""Names of the mutations mutate() chooses from, in order.""")
+	changes = property(fget=__get_changes, doc="""(box, first index) changed since the scored organism this one was derived from, or None if it must be rendered in full.""")
+
+	def __mutation_swap(self, target):
+		src_dna = random.randint(0, len(self.dna) - 1)
+		dest_dna = random.randint(0, len(self.dna) - 1)
+		if src_dna == dest_dna:
+			return self
+		new_dna = self.dna.swap(src_dna, dest_dna)
+		result = self.__spawn(new_dna, fitness.union_box(self.__box(self.dna[src_dna]), self.__box(self.dna[dest_dna])), min(src_dna, dest_dna))
+		return result
+
+	def __mutation_del(self, target):
+		if len(self.dna) <= 1:
+			return self
+		which_dna = random.randint(0, len(self.dna) - 1)
+		new_dna = self.dna.delete(which_dna)
+		return self.__spawn(new_dna, self.__box(self.dna[which_dna]), which_dna)
+
+	def __mutation_shift_col(self, which_dna, index, minv, maxv, maxchange):
+		if len(self.dna) == 0:
+			return self
+		change = random.randint(-maxchange, maxchange)
+		cols = list(self.dna.color(which_dna))
+		cols[index] += change
+		if cols[index] < minv:
+			cols[index] = minv
+		elif cols[index] > maxv:
+			cols[index] = maxv
+		new_dna = self.dna.set_color(which_dna, cols)
+		return self.__spawn(new_dna, self.__box(self.dna[which_dna]), which_dna)
+
+	def __mutation_colshift(self, target):
+		which_dna = random.randint(0, len(self.dna) - 1)
+		result = self.__mutation_rshift(which_dna).__mutation_gshift(which_dna).__mutation_bshift(which_dna).__mutation_ashift(which_dna)
+		return result
+
+	def __mutation_colsolve(self, target):
+		"""Sets a shape's RGB to the least squares fit to the target beneath it, in place of many random colour shifts. Needs the target and config['SOLVE_COLOR']."""
+		if target == None or not self.__config['SOLVE_COLOR']:
+			return self
+		which_dna = random.randint(0, len(self.dna) - 1)
+		shape = self.dna[which_dna]
+		box = self.__box(shape)
+		if fitness.box_empty(box):
+			return self
+		layers = [self.__alpha(shape, box)]
+		for other in self.dna[which_dna + 1:]:
+			if not fitness.box_empty(fitness.intersect_box(self.__shape_box(other), box)):
+				layers.append(self.__alpha(other, box))
+		color = target.solve_color(self.image.crop(box), box, shape[0], layers)
+		if color == None or color == tuple(shape[0][:3]):
+			return self
+		new_dna = self.dna.set_color(which_dna, color + (shape[0][3],))
+		return self.__spawn(new_dna, box, which_dna)
+
+	def __mutation_colsearch(self, target):
+		"""Scores config['COLOR_VARIANTS'] random colour shifts of a shape in one batch and keeps the best of them, if it beats the shape's current colour. Needs the target."""
+		if target == None or self.__config['COLOR_VARIANTS'] < 1:
+			return self
+		which_dna = random.randint(0, len(self.dna) - 1)
+		shape = self.dna[which_dna]
+		box = self.__box(shape)
+		if fitness.box_empty(box):
+			return self
+		colors = [self.__shifted_color(shape[0]) for index in range(self.__config['COLOR_VARIANTS'])] + [tuple(shape[0])]
+		errors = self.__color_errors(target, which_dna, colors)
+		best = int(errors[:-1].argmin())
+		if errors[best] >= errors[-1]:
+			return self
+		return self.__spawn(self.dna.set_color(which_dna, colors[best]), box, which_dna)
+
+	def __shifted_color(self, color):
+		change = self.__config['CHG_COLOR']
+		limits = ((0, 255), (0, 255), (0, 255), (self.__config['MIN_ALPHA'], self.__config['MAX_ALPHA']))
+		return tuple([min(max(color[index] + random.randint(-change, change), limits[index][0]), limits[index][1]) for index in range(4)])
+
+	def __color_errors(self, target, which_dna, colors):
+		"""Returns the squared error over the pixels shape which_dna covers with its colour set to each of colors, compositing the shapes beneath it once."""
+		shape = self.dna[which_dna]
+		box = self.__box(shape)
+		layers = []
+		for other in self.dna[which_dna + 1:]:
+			if not fitness.box_empty(fitness.intersect_box(self.__shape_box(other), box)):
+				layers.append((other[0], self.__alpha(other, box)))
+		return target.variant_errors(self.__render_region(box, which_dna, which_dna), box, self.__alpha(shape, box), colors, layers)
+
+	def color_scores(self, target, which_dna, colors):
+		"""Returns the score this scored organism would have with shape which_dna recoloured to each of colors, (r, g, b, a), as a list."""
+		assert self.score >= 0
+		errors = self.__color_errors(target, which_dna, list(colors) + [tuple(self.dna.color(which_dna))])
+		return [self.score - int(errors[-1]) + int(error) for error in errors[:-1]]
+
+	def __mutation_rshift(self, which_dna):
+		return self.__mutation_shift_col(which_dna, 0, 0, 255, self.__config['CHG_COLOR'])
+
+	def __mutation_gshift(self, which_dna):
+		return self.__mutation_shift_col(which_dna, 1, 0, 255, self.__config['CHG_COLOR'])
+
+	def __mutation_bshift(self, which_dna):
+		return self.__mutation_shift_col(which_dna, 2, 0, 255, self.__config['CHG_COLOR'])
+
+	def __mutation_ashift(self, which_dna):
+		return self.__mutation_shift_col(which_dna, 3, self.__config['MIN_ALPHA'], self.__config['MAX_ALPHA'], self.__config['CHG_COLOR'])
+
+	def __mutation_shape(self, mutation):
+		change = mutation(self.__shape, self.__config, self.size, self.dna)
+		if change == None:
+			return self
+		return self.__spawn_changed(change[0], change[1])
+
+	def __shape_box(self, shape):
+		return self.__shape.box(shape[1])
+
+	def __box(self, shape):
+		return fitness.clip_box(self.__shape_box(shape), self.size)
+
+	def __spawn(self, new_dna, box, first):
+		if self.__rows is not None:
+			return ImageOrganism(self.__config, self.size, new_dna, self, box, first, self.__cache)
+		if self.__base is None:
+			return ImageOrganism(self.__config, self.size, new_dna, cache=self.__cache)
+		return ImageOrganism(self.__config, self.size, new_dna, self.__base, fitness.union_box(self.__dirty, box), min(self.__first, first), self.__cache)
+
+	def __spawn_changed(self, new_dna, which_dna):
+		return self.__spawn(new_dna, fitness.union_box(self.__box(self.dna[which_dna]), self.__box(new_dna[which_dna])), which_dna)
+
+	def __alpha(self, shape, box):
+		"""Returns the alpha with which shape is composited, as an 'L' image of box."""
+		shape_box = self.__shape_box(shape)
+		alpha = Image.new('L', (box[2] - box[0], box[3] - box[1]))
+		alpha.paste(self.__shape.render(shape[0], shape[1], shape_box).split()[3], (shape_box[0] - box[0], shape_box[1] - box[1]))
+		return alpha
+
+	def __blank(self, size):
+		image = Image.new("RGB", size)
+		if self.__config['WHITE_BG']:
+			d = ImageDraw.Draw(image)
+			d.rectangle(((0,0),size), fill=(255,255,255,255))
+		return image
+
+	def __composite(self, image, box, start, stop):
+		for shape in self.dna[start:stop]:
+			shape_box = self.__shape_box(shape)
+			if fitness.box_empty(fitness.intersect_box(shape_box, box)):
+				continue
+			rendered = self.__shape.render(shape[0], shape[1], shape_box)
+			image.paste(rendered, (shape_box[0] - box[0], shape_box[1] - box[1]), rendered)
+
+	def __render_prefix(self, index):
+		"""Returns the composite of dna[:index] from the deepest cached checkpoint, which may be shared with the cache and must not be modified."""
+		start, image = self.__cache.lookup(self.dna, index)
+		if image != None and start == index:
+			return image
+		if image == None:
+			image = self.__blank(self.size)
+		else:
+			image = image.copy()
+		interval = self.__cache.interval
+		while start < index:
+			stop = min(start + interval - start % interval, index)
+			self.__composite(image, (0, 0) + self.size, start, stop)
+			start = stop
+			if start % interval == 0:
+				self.__cache.store(self.dna, start, image.copy())
+		return image
+
+	def __render_region(self, box, first, stop):
+		"""Returns the composite of dna[:stop] within box, resuming from the deepest cached checkpoint at or below first."""
+		start = first - first % self.__cache.interval
+		if start > 0:
+			image = self.__render_prefix(start).crop(box)
+		else:
+			image = self.__blank((box[2] - box[0], box[3] - box[1]))
+		self.__composite(image, box, start, stop)
+		return image
+
+	def render(self):
+		"""Renders what calc_score needs: the changed box of an organism derived from a scored one, or else the whole image."""
+		if self.__image != None:
+			return
+		if self.__base is None:
+			self.__image = self.__render_prefix(len(self.dna))
+		elif self.__region == None and not fitness.box_empty(self.__dirty):
+			self.__region = self.__render_region(self.__dirty, self.__first, len(self.dna))
+
+	def __render(self):
+		self.render()
+		if self.__image != None:
+			return
+		self.__image = self.__base.image.copy()
+		if self.__region != None:
+			self.__image.paste(self.__region, self.__dirty[:2])
+		self.__base = None
+		self.__region = None
+
+	# Mutations which apply to any primitive, given the target or None. The primitive's own mutations are numbered after these.
+	__mutations = (
+		__mutation_swap,
+		__mutation_del,
+		__mutation_colshift,
+		__mutation_colsolve,
+		__mutation_colsearch,
+		)
+
+	def mutate(self, choose=None, target=None):
+		"""Applies MIN_MUTATIONS to MAX_MUTATIONS mutations, each picked by choose(count) out of mutation_names or else uniformly; those fitting the target need it given."""
+		num_mutations = random.randint(self.__config['MIN_MUTATIONS'], self.__config['MAX_MUTATIONS'])
+		result = self
+		for x in range(num_mutations):
+			if choose == None:
+				mutation = random.randint(0, len(self.__mutations) + len(self.__shape.mutations) - 1)
+			else:
+				mutation = choose(len(self.__mutations) + len(self.__shape.mutations))
+			if mutation < len(self.__mutations):
+				nresult = self.__mutations[mutation](result, target)
+			else:
+				nresult = result.__mutation_shape(self.__shape.mutations[mutation - len(self.__mutations)])
+			if nresult != result:
+				nresult.__mutation = mutation
+				result = nresult
+		return result
+
+	def add_shape(self, target=None):
+		"""Returns a child with one more shape on top, placed where this organism is furthest from the target and coloured its mean beneath, if the target is given."""
+		point = None
+		if target != None and self.__config['ERROR_TILE'] > 0:
+			if self.__errors is None:
+				self.__errors = target.tile_errors(self.image, self.__config['ERROR_TILE'])
+			point = fitness.sample_point(self.__errors, self.__config['ERROR_TILE'], self.size)
+		shape = self.__shape.generate(self.__config, self.size, point)
+		if point != None:
+			box = self.__shape_box(shape)
+			clipped = self.__box(shape)
+			mask = self.__shape.render((255, 255, 255, 255), shape[1], box).crop((clipped[0] - box[0], clipped[1] - box[1], clipped[2] - box[0], clipped[3] - box[1])).split()[3]
+			color = target.mean_color(clipped, mask)
+			if color != None:
+				shape = (color + (shape[0][3],), shape[1])
+		return self.__spawn(self.dna.append(shape), self.__box(shape), len(self.dna))
+
+	def crossover(self, other):
+		"""Returns a child of this organism's layers below a random cut followed by other's layers from the same depth on."""
+		head = random.randint(1, len(self.dna))
+		new_dna = self.dna.join(head, other.dna, min(head, len(other.dna)))
+		box = (0, 0, 0, 0)
+		for index in range(head, len(self.dna)):
+			box = fitness.union_box(box, self.__box(self.dna[index]))
+		for index in range(head, len(new_dna)):
+			box = fitness.union_box(box, self.__box(new_dna[index]))
+		return self.__spawn(new_dna, box, head)
+
+	def calc_score(self, target, bound=None):
+		"""Returns the score, from just the changed box if derived from a scored organism, or None once it is sure to exceed bound, leaving the organism unscored."""
+		self.render()
+		if self.__base is None:
+			rows = target.row_scores(self.image, limit=bound)
+			if rows is None:
+				return None
+		else:
+			rows = self.__base.__rows
+			if not fitness.box_empty(self.__dirty):
+				if self.__base.__pixel_errors is None:
+					self.__base.__pixel_errors = target.pixel_errors(self.__base.image)
+				old = fitness.box_rows(self.__base.__pixel_errors, self.__dirty)
+				limit = None
+				if bound != None:
+					limit = bound - self.__base.score + int(old.sum())
+				new = target.box_scores(self.__region, self.__dirty, limit)
+				if new is None:
+					return None
+				rows = rows.copy()
+				rows[self.__dirty[1]:self.__dirty[3]] += new - old
+		self.__rows = rows
+		self.__score = int(rows.sum())
+		return self.score
+
+def make_candidate(current, nc, config, choose=None, target=None):
+	if nc >= config['ADD_PLATEAU'] + int(len(current.dna) * config['ADD_PLATEAU_PER_SHAPE']) and nc % config['ADD_EVERY'] == 0 and (config['MAX_POLYGONS'] == None or len(current.dna) < config['MAX_POLYGONS']):
+		return current.add_shape(target)
+	candidate = current
+	while candidate == current:
+		candidate = current.mutate(choose, target)
+	return candidate
+
+def mutation_label(organism):
+	"""Names what produced an organism, for the statistics. Organisms with a new shape and no mutation are labelled 'add'."""
+	return organism.mutation_name or 'add'
+
+def improves(candidate, score, current):
+	"""Returns whether a candidate scoring score should replace current. A score of None, from a bounded scoring which gave up, never does."""
+	if score == None:
+		return False
+	return score < current.score or (score <= current.score and candidate.mutation_name in ('del', 'vertdel'))
+
+# Seconds to wait for a batch from the pool. Python 2 runs signal handlers only once a wait without a timeout returns.
+POOL_TIMEOUT = 3600
+
+worker = {}
+
+def init_worker(config, shared):
+	"""Attaches each worker process to the target pixels in shared memory."""
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	worker['config'] = config
+	worker['target'] = fitness.Target(shared=shared)
+	worker['cache'] = render.LayerCache(config['CACHE_INTERVAL'], config['CACHE_SIZE'])
+	worker['token'] = None
+
+def init_regenerate(config, size):
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	worker['config'] = config
+	worker['size'] = size
+	worker['cache'] = render.LayerCache(config['CACHE_INTERVAL'], config['CACHE_SIZE'])
+
+def regenerate_worker(task):
+	"""Re-renders the image of a past generation in a background process, which gets generations in order so its layer cache carries their common prefixes over."""
+	generation, dna = task
+	org = ImageOrganism(worker['config'], worker['size'], dna, cache=worker['cache'])
+	save_image(generation, org.image, image_hash(worker['config'], worker['size'], dna))
+
+def timed(make, spent):
+	"""Wraps make so the seconds each call takes are appended to spent."""
+	def call(*args):
+		start = time.time()
+		result = make(*args)
+		spent.append(time.time() - start)
+		return result
+	return call
+
+def gain(score, current):
+	"""Returns how much a candidate scoring score improved on current, or 0 if its bounded scoring gave up."""
+	if score == None:
+		return 0
+	return current.score - score
+
+def score_worker(task):
+	"""Scores a candidate in a worker process, incrementally against the task's current DNA, or returns None if its score exceeds the task's bound."""
+	token, current_dna, dna, changes, bound = task
+	config = worker['config']
+	target = worker['target']
+	if current_dna != None and worker['token'] != token:
+		worker['current'] = ImageOrganism(config, target.size, current_dna, cache=worker['cache'])
+		worker['current'].calc_score(target)
+		worker['token'] = token
+	if changes == None:
+		candidate = ImageOrganism(config, target.size, dna, cache=worker['cache'])
+	else:
+		candidate = ImageOrganism(config, target.size, dna, worker['current'], changes[0], changes[1], worker['cache'])
+	return candidate.calc_score(target, bound)
+
+def score_batch(organisms, target, pool, memo):
+	"""Scores organisms from scratch, in the pool if there is one, skipping those whose score memo already knows."""
+	scores = [memo.lookup(organism.dna)[1] for organism in organisms]
+	missing = [index for index in range(len(organisms)) if scores[index] == None]
+	if pool == None:
+		found = [organisms[index].calc_score(target) for index in missing]
+	else:
+		found = pool.map_async(score_worker, [(None, None, organisms[index].dna, None, None) for index in missing]).get(POOL_TIMEOUT)
+	for index, score in zip(missing, found):
+		scores[index] = score
+		memo.store(organisms[index].dna, score)
+	return scores
+
+class Search:
+	"""A search for organisms closer to a target than current, run one iteration at a time with step()."""
+
+	def __init__(self, config, target, current, schedule, memo, counters, pool=None, x=0):
+		self.__config = config
+		self.__target = target
+		self.__current = current
+		self.__schedule = schedule
+		self.__memo = memo
+		self.__counters = counters
+		self.__pool = pool
+		self.__x = x
+		self.__nc = 0
+		self.__token = 0
+		self.__members = None
+
+	def __get_current(self):
+		return self.__current
+
+	def __get_x(self):
+		return self.__x
+
+	def __get_nc(self):
+		return self.__nc
+
+	current = property(fget=__get_current, doc="""Best organism found so far.""")
+	x = property(fget=__get_x, doc="""Number of candidates tried.""")
+	nc = property(fget=__get_nc, doc="""Number of candidates tried since current was last replaced.""")
+
+	def step(self):
+		"""Makes and scores a candidate, or a batch of them in the pool or population, and returns the one which replaced current, or None."""
+		config = self.__config
+		target = self.__target
+		current = self.__current
+		nc = self.__nc
+		schedule = self.__schedule
+		memo = self.__memo
+		counters = self.__counters
+		pool = self.__pool
+		mark = time.time()
+		start = mark
+		if config['POPULATION'] > 1:
+			if self.__members == None:
+				seeds = [make_candidate(current, nc + index, config, schedule.choose, target) for index in range(config['POPULATION'] - 1)]
+				self.__members = population.Population([current] + seeds, [current.score] + score_batch(seeds, target, pool, memo), config)
+			spent = []
+			children = self.__members.breed(timed(lambda parent, index: make_candidate(parent, nc + index, config, schedule.choose, target), spent))
+			now = time.time()
+			counters.add('mutate', now - mark)
+			scores = score_batch(children, target, pool, memo)
+			self.__members.advance(children, scores)
+			mark = time.time()
+			counters.add('score', mark - now)
+			for index in range(len(children)):
+				schedule.update(children[index].mutation_name, current.score - scores[index], spent[index] + (mark - now) / len(children))
+				counters.tried(mutation_label(children[index]))
+			batch = len(children)
+			score, candidate = self.__members.best
+			accepted = score < current.score
+			if accepted and candidate.score != score:
+				candidate.calc_score(target)
+		elif pool == None:
+			candidate = make_candidate(current, nc, config, schedule.choose, target)
+			now = time.time()
+			counters.add('mutate', now - mark)
+			mark = now
+			known, score = memo.lookup(candidate.dna, current.score)
+			if not known:
+				candidate.render()
+				mark = time.time()
+				counters.add('render', mark - now)
+				score = candidate.calc_score(target, current.score)
+				memo.store(candidate.dna, score, current.score)
+			accepted = improves(candidate, score, current)
+			if accepted and candidate.score != score:
+				candidate.calc_score(target)
+			evaluated = time.time()
+			counters.add('score', evaluated - mark)
+			schedule.update(candidate.mutation_name, gain(score, current), evaluated - start)
+			counters.tried(mutation_label(candidate))
+			batch = 1
+		else:
+			spent = []
+			make = timed(make_candidate, spent)
+			candidates = [make(current, nc + index, config, schedule.choose, target) for index in range(config['WORKERS'])]
+			now = time.time()
+			counters.add('mutate', now - mark)
+			scores = [memo.lookup(c.dna, current.score) for c in candidates]
+			missing = [index for index in range(len(candidates)) if not scores[index][0]]
+			found = pool.map_async(score_worker, [(self.__token, current.dna, candidates[index].dna, candidates[index].changes, current.score) for index in missing]).get(POOL_TIMEOUT)
+			scores = [score for known, score in scores]
+			for index, score in zip(missing, found):
+				scores[index] = score
+				memo.store(candidates[index].dna, score, current.score)
+			mark = time.time()
+			counters.add('score', mark - now)
+			for index in range(len(candidates)):
+				schedule.update(candidates[index].mutation_name, gain(scores[index], current), spent[index] + (mark - now) / len(candidates))
+				counters.tried(mutation_label(candidates[index]))
+			best = None
+			for index in range(len(candidates)):
+				if improves(candidates[index], scores[index], current) and (best == None or scores[index] < scores[best]):
+					best = index
+			accepted = best != None
+			batch = len(candidates)
+			if accepted:
+				candidate = candidates[best]
+				candidate.calc_score(target)
+				self.__token += 1
+		self.__x += batch
+		if not accepted:
+			self.__nc += batch
+			return None
+		if len(current.dna) != len(candidate.dna):
+			config['generation'] += 1
+		config['SCHEDULE'] = schedule.state()
+		counters.accepted(mutation_label(candidate))
+		self.__current = candidate
+		self.__nc = 0
+		return candidate
+
+def image_hash(config, size, dna):
+	"""Identifies what an organism renders to, so a saved image can be checked against the DNA it should show."""
+	return hashlib.sha1(repr((size, config['WHITE_BG'])) + dna.tostring()).hexdigest()
+
+def image_current(generation, digest):
+	"""Returns whether best.N.png exists and was rendered from DNA with the given hash."""
+	if not os.path.exists('best.' + str(generation) + '.png'):
+		return False
+	try:
+		f = open('best.' + str(generation) + '.sha1', 'r')
+		saved = f.read().strip()
+		f.close()
+	except IOError:
+		return False
+	return saved == digest
+
+def save_image(generation, image, digest):
+	"""Saves best.N.png, then the hash of the DNA it was rendered from beside it."""
+	writer.replace('best.' + str(generation) + '.png', lambda f: image.save(f, 'PNG'))
+	writer.replace('best.' + str(generation) + '.sha1', lambda f: f.write(digest + '\n'), 'w')
+
+def report_row(page, config, generation, score, x, count):
+	page.add(generation, ['best.' + str(generation) + '.png', config['image']], [
+		('Generation', locale.format('%d', generation, True)),
+		('Shapes', locale.format('%d', count, True)),
+		('Iteration', locale.format('%d', x, True)),
+		('Score', locale.format('%d', score, True))])
+
+def merge_checkpoints(old, new):
+	"""Folds an older pending checkpoint into a newer one, keeping the history records and image of every generation either one saves."""
+	images = dict(old['images'])
+	images.update(new['images'])
+	new['images'] = images
+	new['records'] = old['records'] + new['records']
+	return new
+
+def checkpoint_state(config, current, output, x):
+	"""Returns the checkpoint of current, just accepted, for write_checkpoint. output is current at the target's full resolution."""
+	return {'images': {config['generation']: output.image}, 'records': [(config['generation'], current.score, x, output.dna)], 'generation': config['generation'], 'dna': current.dna, 'output': output.dna, 'x': x, 'config': dict(config)}
+
+def write_checkpoint(state, log, page, counters=None):
+	start = time.time()
+	config = state['config']
+	latest = {}
+	for record in state['records']:
+		log.append(*record)
+		latest[record[0]] = record
+	for generation in sorted(state['images']):
+		image = state['images'][generation]
+		save_image(generation, image, image_hash(config, image.size, latest[generation][3]))
+	shutil.copy('best.' + str(state['generation']) + '.png', 'best.png.tmp')
+	os.rename('best.png.tmp', 'best.png')
+	writer.replace('best.dna', lambda f: f.write(repr(state['output']) + '\n'), 'w')
+	writer.replace('best.pickle', lambda f: pickle.dump((state['dna'], state['x'], config), f))
+	for generation in sorted(latest):
+		record = latest[generation]
+		report_row(page, config, generation, record[1], record[2], len(record[3]))
+	if counters != None:
+		counters.add('io', time.time() - start)
+
+def start_pool(config, target):
+	if config['WORKERS'] <= 1:
+		return None
+	return multiprocessing.Pool(config['WORKERS'], init_worker, (config, target.share()))
+
+def level_scale(config):
+	"""Returns how many times smaller than the target the current pyramid level is."""
+	return 2 ** (config['PYRAMID_LEVELS'] - 1 - config['PYRAMID_LEVEL'])
+
+def level_target(target_image, config):
+	scale = level_scale(config)
+	image = target_image
+	if scale > 1:
+		size = (max(1, target_image.size[0] / scale), max(1, target_image.size[1] / scale))
+		image = target_image.resize(size, Image.ANTIALIAS)
+	importance = None
+	if config['IMPORTANCE'] != None:
+		importance = Image.open(config['IMPORTANCE']).convert('L').resize(image.size, Image.ANTIALIAS)
+	return fitness.Target(image, measure=metric.METRICS[config['METRIC']], importance=importance, values=target_values(image, config))
+
+def target_values(image, config):
+	"""Returns the target converted to config['METRIC']'s colour space, or None for RGB, saving it as target.<metric>.<width>x<height>.npy for the next start."""
+	measure = metric.METRICS[config['METRIC']]
+	if not measure.converts:
+		return None
+	path = 'target.' + config['METRIC'] + '.' + str(image.size[0]) + 'x' + str(image.size[1])
+	digest = hashlib.sha1(repr(image.size) + numpy.asarray(image).tostring()).hexdigest()
+	try:
+		f = open(path + '.sha1', 'r')
+		saved = f.read().strip()
+		f.close()
+		if saved == digest:
+			return numpy.load(path + '.npy')
+	except (IOError, ValueError):
+		pass
+	values = measure.convert(numpy.asarray(image, dtype=numpy.uint8))
+	writer.replace(path + '.npy', lambda f: numpy.save(f, values))
+	writer.replace(path + '.sha1', lambda f: f.write(digest + '\n'), 'w')
+	return values
+
+def default_config(shape, defaults={}):
+	"""Returns the settings of a fresh run with shapes of the named primitive. defaults override the engine's and the primitive's own settings."""
+	config = {}
+
+	config['SHAPE'] = shape
+	config['CHG_COORD'] = 5
+	# No limit if None.
+	config['MAX_POLYGONS'] = 150
+	# A shape is added once ADD_PLATEAU plus ADD_PLATEAU_PER_SHAPE for each shape candidates in a row have failed, on every ADD_EVERY'th of them.
+	config['ADD_PLATEAU'] = 30
+	config['ADD_PLATEAU_PER_SHAPE'] = 0.5
+	config['ADD_EVERY'] = 2
+	config['MIN_MUTATIONS'] = 1
+	config['MAX_MUTATIONS'] = 3
+
+	config['MIN_ALPHA'] = 31
+	config['MAX_ALPHA'] = 255
+	config['CHG_COLOR'] = 15
+
+	config['WHITE_BG'] = False
+
+	config['CACHE_INTERVAL'] = 10
+	config['CACHE_SIZE'] = 32
+	config['SCORE_CACHE_SIZE'] = 4096
+
+	config['METRIC'] = 'rgb'
+	config['IMPORTANCE'] = None
+
+	config['WORKERS'] = 1
+
+	config['PYRAMID_LEVELS'] = 1
+	config['PYRAMID_LEVEL'] = 0
+	config['PYRAMID_PLATEAU'] = 250
+
+	config['POPULATION'] = 1
+	config['ELITE'] = 2
+	config['TOURNAMENT'] = 3
+	config['CROSSOVER_RATE'] = 0.7
+
+	config['STATS_INTERVAL'] = 10.0
+
+	config['ERROR_TILE'] = 8
+	config['SOLVE_COLOR'] = True
+	config['COLOR_VARIANTS'] = 16
+
+	config['SCHEDULE_FLOOR'] = 0.2
+	config['SCHEDULE_DECAY'] = 0.99
+	config['SCHEDULE_TIMED'] = True
+
+	config['image'] = 'target.jpg'
+
+	config.update(shapes.SHAPES[shape].defaults)
+	config.update(defaults)
+	return config
+
+def main(argv, shape, defaults={}):
+	"""Runs the search with shapes of the named primitive. defaults override the engine's and the primitive's own settings, but not those of a resumed run."""
+	locale.setlocale(locale.LC_ALL, '')
+
+	config = default_config(shape, defaults)
+
+	init_dna = []
+	x = 0
+	nc = 0
+	old_history = {}
+	try:
+		f = open('best.pickle', 'rb')
+		saved = pickle.load(f)
+		f.close()
+		if len(saved) == 4:
+			init_dna, x, old_history, newconfig = saved
+		elif len(saved) == 3:
+			init_dna, x, newconfig = saved
+		else:
+			init_dna, x = saved
+			newconfig = {}
+		config.update(newconfig)
+	except:
+		pass
+	saved_scale = level_scale(config)
+
+	try:
+		opts, args = getopt.getopt(argv, 'd:p:wbi:j:s:g:f:m:', ['max-degree=', 'max-polygons=', 'white-bg', 'black-bg', 'image=', 'workers=', 'pyramid=', 'population=', 'metric=', 'importance=', 'error-tile=', 'solve-color', 'no-solve-color', 'color-variants='])
+	except getopt.GetoptError:
+		print 'invalid arg'
+		sys.exit(1)
+	if len(args) > 0:
+		print 'invalid args'
+		sys.exit(1)
+
+	for opt, arg in opts:
+		if opt in ('-d', '--max-degree'):
+			val = int(arg)
+			if val < 3:
+				print 'invalid args'
+				sys.exit(1)
+			config['MAX_DEGREE'] = val
+		elif opt in ('-p', '--max-polygons'):
+			val = int(arg)
+			if val < 1:
+				print 'invalid args'
+				sys.exit(1)
+			config['MAX_POLYGONS'] = val
+		elif opt in ('-w', '--white-bg'):
+			config['WHITE_BG'] = True
+		elif opt in ('-b', '--black-bg'):
+			config['WHITE_BG'] = False
+		elif opt in ('-i', '--image'):
+			config['image'] = arg
+		elif opt in ('-j', '--workers'):
+			val = int(arg)
+			if val < 1:
+				print 'invalid args'
+				sys.exit(1)
+			config['WORKERS'] = val
+		elif opt in ('-s', '--pyramid'):
+			val = int(arg)
+			if val < 1:
+				print 'invalid args'
+				sys.exit(1)
+			config['PYRAMID_LEVELS'] = val
+		elif opt in ('-g', '--population'):
+			val = int(arg)
+			if val < 1:
+				print 'invalid args'
+				sys.exit(1)
+			config['POPULATION'] = val
+		elif opt in ('-f', '--metric'):
+			if arg not in metric.METRICS:
+				print 'invalid args'
+				sys.exit(1)
+			config['METRIC'] = arg
+		elif opt in ('-m', '--importance'):
+			if not os.path.exists(arg):
+				print 'invalid args'
+				sys.exit(1)
+			config['IMPORTANCE'] = arg
+		elif opt == '--error-tile':
+			val = int(arg)
+			if val < 0:
+				print 'invalid args'
+				sys.exit(1)
+			config['ERROR_TILE'] = val
+		elif opt == '--solve-color':
+			config['SOLVE_COLOR'] = True
+		elif opt == '--no-solve-color':
+			config['SOLVE_COLOR'] = False
+		elif opt == '--color-variants':
+			val = int(arg)
+			if val < 0:
+				print 'invalid args'
+				sys.exit(1)
+			config['COLOR_VARIANTS'] = val
+	
+	if config.get('generation') == None:
+		config['generation'] = len(init_dna)
+	config['PYRAMID_LEVEL'] = min(config['PYRAMID_LEVEL'], config['PYRAMID_LEVELS'] - 1)
+	if not isinstance(init_dna, genome.Genome):
+		init_dna = genome.Genome([shapes.SHAPES[config['SHAPE']].convert(item) for item in init_dna])
+	if len(init_dna) > 0:
+		# A resumed run carries on at the resolution its DNA was saved at, or the nearest finer one which -s leaves.
+		config['PYRAMID_LEVEL'] = config['PYRAMID_LEVELS'] - 1
+		while config['PYRAMID_LEVEL'] > 0 and level_scale(config) < saved_scale:
+			config['PYRAMID_LEVEL'] -= 1
+		if level_scale(config) < saved_scale:
+			init_dna = init_dna.scale(saved_scale / level_scale(config), shapes.SHAPES[config['SHAPE']])
+	log = history.HistoryLog('best.history')
+	for item in sorted(old_history):
+		if item not in log:
+			log.append(item, old_history[item][0], old_history[item][1], genome.Genome(old_history[item][2]))
+	del old_history
+
+	print 'Dumping configuration:'
+	for item in config:
+		print str(item) + ': ' + str(config[item])
+	print ''
+	
+	target_image = Image.open(config['image']).convert('RGB')
+	target = level_target(target_image, config)
+	scale = level_scale(config)
+
+	cache = render.LayerCache(config['CACHE_INTERVAL'], config['CACHE_SIZE'])
+	stale = []
+	for item in log.generations():
+		dna = log.dna(item)
+		if image_current(item, image_hash(config, target_image.size, dna)):
+			continue
+		if item == config['generation']:
+			# The search may save this generation again, so it must not race a background render.
+			org = ImageOrganism(config, target_image.size, dna, cache=cache)
+			save_image(item, org.image, image_hash(config, target_image.size, dna))
+		else:
+			stale.append(item)
+	regenerate = None
+	if len(stale) > 0:
+		print 'Regenerating ' + str(len(stale)) + ' past images in the background.'
+		regenerate = multiprocessing.Pool(1, init_regenerate, (config, target_image.size))
+		# The pool reads the tasks as it sends them, so each genome is loaded only then, through a handle of its own which the writer never moves.
+		past = history.HistoryLog('best.history')
+		regenerate.imap(regenerate_worker, ((item, past.dna(item)) for item in stale))
+		regenerate.close()
+
+	search_cache = cache
+	if scale > 1:
+		search_cache = render.LayerCache(config['CACHE_INTERVAL'], config['CACHE_SIZE'])
+	current = ImageOrganism(config, target.size, init_dna, cache=search_cache)
+	if len(current.dna) == 0:
+		current = current.add_shape(target)
+		config['generation'] += 1
+	current.calc_score(target)
+	schedule = scheduler.Scheduler(current.mutation_names, config, config.get('SCHEDULE'))
+
+	pool = start_pool(config, target)
+	memo = fitness.ScoreCache(config['SCORE_CACHE_SIZE'])
+	memo.store(current.dna, current.score)
+
+	page = report.Report()
+	if len(page) == 0:
+		for item in log.generations():
+			score, hist_x, count = log.entry(item)
+			report_row(page, config, item, score, hist_x, count)
+	counters = stats.Stats('stats.json', config['STATS_INTERVAL'], memo)
+	checkpoints = writer.Writer(lambda state: write_checkpoint(state, log, page, counters), merge_checkpoints)
+	search = Search(config, target, current, schedule, memo, counters, pool, x)
+	# SIGINT only sets a flag, checked before each iteration, as a KeyboardInterrupt raised in the middle of a map can hang the pool.
+	interrupted = []
+	signal.signal(signal.SIGINT, lambda signum, frame: interrupted.append(signum))
+	while not interrupted:
+		if search.nc >= config['PYRAMID_PLATEAU'] and scale > 1:
+			config['PYRAMID_LEVEL'] += 1
+			target = level_target(target_image, config)
+			scale = level_scale(config)
+			search_cache = cache
+			if scale > 1:
+				search_cache = render.LayerCache(config['CACHE_INTERVAL'], config['CACHE_SIZE'])
+			current = ImageOrganism(config, target.size, search.current.dna.scale(2, shapes.SHAPES[config['SHAPE']]), cache=search_cache)
+			current.calc_score(target)
+			if pool != None:
+				pool.terminate()
+				pool = start_pool(config, target)
+			memo.clear()
+			memo.store(current.dna, current.score)
+			search = Search(config, target, current, schedule, memo, counters, pool, search.x)
+			print 'Advanced to pyramid level ' + str(config['PYRAMID_LEVEL'] + 1) + ' of ' + str(config['PYRAMID_LEVELS']) + '. (Size: ' + str(target.size[0]) + 'x' + str(target.size[1]) + ', Score: ' + locale.format('%d', current.score, True) + ')'
+		#print 'Running iteration #' + locale.format('%d', search.x, True) + ' (nc: ' + locale.format('%d', search.nc, True) + ')'
+		nc = search.nc
+		current = search.step()
+		if current != None:
+			mark = time.time()
+			output = current
+			if scale > 1:
+				output = ImageOrganism(config, target_image.size, current.dna.scale(scale, shapes.SHAPES[config['SHAPE']]), cache=cache)
+			checkpoints.submit(checkpoint_state(config, current, output, search.x))
+			print 'Replaced current with candidate. (NC: ' + locale.format('%3d', nc, True) + ', Score: ' + locale.format('%d', current.score, True) + ', Iter: ' + locale.format('%d', search.x, True) + ', Shapes: ' + locale.format('%d', len(current.dna), True) + ', Mut: ' + current.mutation_name + ')'
+			counters.add('accept', time.time() - mark)
+		counters.report(time.time())
+	# A second SIGINT while the checkpoints are flushed kills the process outright.
+	signal.signal(signal.SIGINT, signal.SIG_DFL)
+	print 'Interrupted, flushing checkpoints.'
+	checkpoints.close()
+	if pool != None:
+		pool.terminate()
+	if regenerate != None:
+		regenerate.terminate()
+	sys.exit(1)
@@ -0,0 +1,411 @@
+#!/usr/bin/python
+
+import Image
+
+import genome
+import metric
+import shapes
+
+from multiprocessing import sharedctypes
+import collections
+import hashlib
+import numpy
+import random
+import sys
+
+CHUNK_ROWS = 64
+
+def box_empty(box):
+	return box[0] >= box[2] or box[1] >= box[3]
+
+def clip_box(box, size):
+	"""Clips an (x0, y0, x1, y1) box, exclusive of x1 and y1, to an image of the given size."""
+	return (max(box[0], 0), max(box[1], 0), min(box[2], size[0]), min(box[3], size[1]))
+
+def intersect_box(a, b):
+	return (max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3]))
+
+def union_box(a, b):
+	if box_empty(a):
+		return b
+	if box_empty(b):
+		return a
+	return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+def blend(under, color, mask):
+	"""Returns under with color pasted over it through mask, as integer arrays which broadcast together, rounding exactly as Image.paste does."""
+	blended = under * (255 - mask) + color * mask + 128
+	return ((blended >> 8) + blended) >> 8
+
+class ScoreCache:
+	"""A bounded LRU cache of scores keyed on a SHA-1 digest of the whole genome, which must be cleared whenever the target changes."""
+
+	def __init__(self, capacity):
+		self.__capacity = capacity
+		self.__entries = collections.OrderedDict()
+		self.__hits = 0
+		self.__misses = 0
+
+	def __get_hits(self):
+		return self.__hits
+
+	def __get_misses(self):
+		return self.__misses
+
+	hits = property(fget=__get_hits, doc="""Number of lookups answered from the cache.""")
+	misses = property(fget=__get_misses, doc="""Number of lookups which had to be scored.""")
+
+	def lookup(self, dna, bound=None):
+		"""Returns (known, score). If known, score is what calc_score(target, bound) would return for dna: its score, or None if it is sure to exceed bound."""
+		key = hashlib.sha1(dna.tostring()).digest()
+		entry = self.__entries.pop(key, None)
+		if entry != None:
+			self.__entries[key] = entry
+			score, exact = entry
+			if bound != None and (score > bound or (not exact and score == bound)):
+				self.__hits += 1
+				return True, None
+			if exact:
+				self.__hits += 1
+				return True, score
+		self.__misses += 1
+		return False, None
+
+	def store(self, dna, score, bound=None):
+		"""Caches score, as returned by calc_score(target, bound), as the score of dna."""
+		if self.__capacity <= 0:
+			return
+		key = hashlib.sha1(dna.tostring()).digest()
+		entry = self.__entries.pop(key, None)
+		if score != None:
+			entry = (score, True)
+		elif entry == None or (not entry[1] and entry[0] < bound):
+			entry = (bound, False)
+		self.__entries[key] = entry
+		while len(self.__entries) > self.__capacity:
+			self.__entries.popitem(last=False)
+
+	def clear(self):
+		self.__entries.clear()
+
+class Target:
+	"""A target image as integer arrays, scored against by the sum of squared differences under a metric from the metric module, a band of rows at a time."""
+
+	def __init__(self, image=None, shared=None, measure=None, importance=None, values=None):
+		if shared == None:
+			image = image.convert('RGB')
+			self.__size = image.size
+			self.__measure = measure or metric.METRICS['rgb']
+			self.__pixels = numpy.asarray(image, dtype=numpy.uint8)
+			self.__values = self.__pixels
+			if self.__measure.converts:
+				if values is None:
+					values = self.__measure.convert(self.__pixels)
+				self.__values = values
+			self.__importance = None
+			if importance != None:
+				self.__importance = numpy.asarray(importance.convert('L'), dtype=numpy.uint8)
+			self.__shared = None
+		else:
+			self.__size, self.__measure, self.__shared = shared
+			self.__pixels, self.__values, self.__importance = [self.__attach(array, bands) for array, bands in zip(self.__shared, (3, 3, 1))]
+		self.__diff = numpy.empty((min(CHUNK_ROWS, self.__size[1]), self.__size[0], 3), dtype=numpy.int32)
+
+	def __get_size(self):
+		return self.__size
+
+	def __get_pixels(self):
+		return self.__pixels
+
+	size = property(fget=__get_size, doc="""Size of the target. (width, height)""")
+	pixels = property(fget=__get_pixels, doc="""Target pixels as a (height, width, 3) uint8 array.""")
+
+	def share(self):
+		"""Moves the arrays into shared memory and returns a handle, which Target(shared=handle) attaches to in processes which inherit it."""
+		if self.__shared == None:
+			values = self.__values
+			if values is self.__pixels:
+				values = None
+			self.__shared = [self.__share(array) for array in (self.__pixels, values, self.__importance)]
+			if values is None:
+				self.__shared[1] = self.__shared[0]
+			self.__pixels, self.__values, self.__importance = [self.__attach(array, bands) for array, bands in zip(self.__shared, (3, 3, 1))]
+		return (self.__size, self.__measure, self.__shared)
+
+	def __share(self, array):
+		if array is None:
+			return None
+		shared = sharedctypes.RawArray('B', array.size)
+		numpy.frombuffer(shared, dtype=numpy.uint8)[:] = array.ravel()
+		return shared
+
+	def __attach(self, shared, bands):
+		if shared == None:
+			return None
+		shape = (self.__size[1], self.__size[0])
+		if bands > 1:
+			shape += (bands,)
+		return numpy.frombuffer(shared, dtype=numpy.uint8).reshape(shape)
+
+	def __errors(self, data, values, importance, diff):
+		"""Returns the error of each pixel of data, RGB pixels, against values in the metric's space, weighted by importance if given, using diff as scratch."""
+		numpy.subtract(self.__measure.convert(data), values, out=diff, dtype=numpy.int32)
+		numpy.multiply(diff, diff, out=diff)
+		# Adding the channels one by one is many times faster than reducing over a trailing axis of three.
+		weights = self.__measure.weights
+		if weights == None:
+			errors = diff[..., 0] + diff[..., 1]
+			errors += diff[..., 2]
+		else:
+			errors = diff[..., 0] * weights[0]
+			errors += diff[..., 1] * weights[1]
+			errors += diff[..., 2] * weights[2]
+		if importance is not None:
+			errors = numpy.multiply(errors, importance, dtype=numpy.int64)
+		return errors
+
+	def __band_errors(self, data, top, start, stop, left, right):
+		"""Returns the errors of rows [start, stop) and columns [left, right) of the target, given data whose first row is top and first column left."""
+		importance = None
+		if self.__importance is not None:
+			importance = self.__importance[start:stop, left:right]
+		return self.__errors(data[start - top:stop - top], self.__values[start:stop, left:right], importance, self.__diff[:stop - start, :right - left])
+
+	def row_scores(self, image, top=0, bottom=None, limit=None):
+		"""Returns the squared error of each row in [top, bottom) as an int64 array. Given a limit, returns None as soon as the total of the bands scored so far exceeds it."""
+		assert image.size == self.size
+		if bottom == None:
+			bottom = self.size[1]
+		if top != 0 or bottom != self.size[1]:
+			image = image.crop((0, top, self.size[0], bottom))
+		return self.box_scores(image, (0, top, self.size[0], bottom), limit)
+
+	def box_scores(self, image, box, limit=None):
+		"""Returns the squared error of each row of box as an int64 array, given an image of just box, or None once the total exceeds limit."""
+		assert image.size == (box[2] - box[0], box[3] - box[1])
+		data = numpy.asarray(image)
+		rows = numpy.empty(box[3] - box[1], dtype=numpy.int64)
+		total = 0
+		for start in range(box[1], box[3], CHUNK_ROWS):
+			stop = min(start + CHUNK_ROWS, box[3])
+			rows[start - box[1]:stop - box[1]] = self.__band_errors(data, box[1], start, stop, box[0], box[2]).sum(axis=1, dtype=numpy.int64)
+			if limit != None:
+				total += int(rows[start - box[1]:stop - box[1]].sum())
+				if total > limit:
+					return None
+		return rows
+
+	def score(self, image):
+		return int(self.row_scores(image).sum())
+
+	def pixel_errors(self, image):
+		"""Returns the squared error of each pixel of the image as a (rows, columns) int64 array."""
+		assert image.size == self.size
+		data = numpy.asarray(image)
+		errors = numpy.empty((self.size[1], self.size[0]), dtype=numpy.int64)
+		for start in range(0, self.size[1], CHUNK_ROWS):
+			stop = min(start + CHUNK_ROWS, self.size[1])
+			errors[start:stop] = self.__band_errors(data, 0, start, stop, 0, self.size[0])
+		return errors
+
+	def tile_errors(self, image, tile):
+		"""Returns the squared error of each tile x tile block of the image as a (rows, columns) int64 array. Blocks on the right and bottom edges are cut short by the image."""
+		assert image.size == self.size
+		data = numpy.asarray(image)
+		columns = numpy.empty((self.size[1], (self.size[0] + tile - 1) / tile), dtype=numpy.int64)
+		for start in range(0, self.size[1], CHUNK_ROWS):
+			stop = min(start + CHUNK_ROWS, self.size[1])
+			columns[start:stop] = numpy.add.reduceat(self.__band_errors(data, 0, start, stop, 0, self.size[0]), numpy.arange(0, self.size[0], tile), axis=1, dtype=numpy.int64)
+		return numpy.add.reduceat(columns, numpy.arange(0, self.size[1], tile), axis=0)
+
+	def mean_color(self, box, mask):
+		"""Returns the mean (r, g, b) of the target within box, weighted by mask, an 'L' image the size of box, or None if the mask is empty."""
+		weights = numpy.asarray(mask, dtype=numpy.float64)
+		total = weights.sum()
+		if total <= 0:
+			return None
+		pixels = self.__pixels[box[1]:box[3], box[0]:box[2]]
+		return tuple([int(round((pixels[:, :, band] * weights).sum() / total)) for band in range(3)])
+
+	def solve_color(self, image, box, color, layers):
+		"""Returns the (r, g, b) minimizing the squared error within box for a shape coloured color under layers of 'L' alphas, or None if it shows nowhere."""
+		slope = numpy.asarray(layers[0], dtype=numpy.float64) / 255.0
+		for layer in layers[1:]:
+			slope *= 1.0 - numpy.asarray(layer, dtype=numpy.float64) / 255.0
+		importance = 1.0
+		if self.__importance is not None:
+			importance = self.__importance[box[1]:box[3], box[0]:box[2]]
+		weight = (slope * slope * importance).sum()
+		if weight <= 0:
+			return None
+		residual = self.__pixels[box[1]:box[3], box[0]:box[2]] - numpy.asarray(image, dtype=numpy.float64)
+		return tuple([int(min(max(round(color[band] + (residual[:, :, band] * slope * importance).sum() / weight), 0), 255)) for band in range(3)])
+
+	def variant_errors(self, under, box, coverage, colors, layers):
+		"""Returns the squared error over the pixels a shape covers for each of colors, (r, g, b, a), as an int64 array, blending the variants together as arrays."""
+		covered = numpy.asarray(coverage) > 0
+		colors = numpy.array(colors, dtype=numpy.uint16).reshape(len(colors), 1, 4)
+		pixels = blend(numpy.asarray(under, dtype=numpy.uint16)[covered][numpy.newaxis], colors[:, :, :3], colors[:, :, 3:])
+		for color, alpha in layers:
+			alpha = numpy.asarray(alpha, dtype=numpy.uint16)[covered]
+			if alpha.any():
+				pixels = blend(pixels, numpy.array(color[:3], dtype=numpy.uint16), alpha[:, numpy.newaxis])
+		importance = None
+		if self.__importance is not None:
+			importance = self.__importance[box[1]:box[3], box[0]:box[2]][covered]
+		errors = self.__errors(pixels, self.__values[box[1]:box[3], box[0]:box[2]][covered], importance, numpy.empty(pixels.shape, dtype=numpy.int32))
+		return errors.reshape(len(colors), -1).sum(axis=1, dtype=numpy.int64)
+
+def box_rows(errors, box):
+	"""Returns the total of each row of box in a (rows, columns) array of per-pixel errors, as an int64 array."""
+	return errors[box[1]:box[3], box[0]:box[2]].sum(axis=1, dtype=numpy.int64)
+
+def sample_point(errors, tile, size):
+	"""Returns a random (x, y) in a tile of errors, as returned by Target.tile_errors, picked in proportion to its error, or None if there is no error."""
+	cumulative = errors.ravel().cumsum()
+	if cumulative[-1] <= 0:
+		return None
+	index = min(int(numpy.searchsorted(cumulative, random.random() * cumulative[-1], side='right')), len(cumulative) - 1)
+	row, column = divmod(index, errors.shape[1])
+	x = random.randint(column * tile, min((column + 1) * tile, size[0]) - 1)
+	y = random.randint(row * tile, min((row + 1) * tile, size[1]) - 1)
+	return (x, y)
+
+# Candidates made and checked against a full render per primitive and metric by the self-check.
+CHAIN_LENGTH = 500
+
+def reference_score(image, target):
+	"""The original per-pixel scoring loop, kept as the reference for Target.score."""
+	data = list(image.getdata())
+	assert len(data) == len(target)
+	score = 0
+	for index in range(len(data)):
+		hsl = data[index]
+		score += (hsl[0] - target[index][0]) ** 2
+		score += (hsl[1] - target[index][1]) ** 2
+		score += (hsl[2] - target[index][2]) ** 2
+	return score
+
+def random_image(size):
+	image = Image.new('RGB', size)
+	image.putdata([(random.randint(0, 255), random.randint(0, 255), random.randint(0, 255)) for i in range(size[0] * size[1])])
+	return image
+
+def main(argv):
+	random.seed(0)
+	for size in ((1, 1), (7, 3), (64, 48), (255, 256)):
+		target_image = random_image(size)
+		target = Target(target_image)
+		for trial in range(3):
+			image = random_image(size)
+			expected = reference_score(image, list(target_image.getdata()))
+			actual = target.score(image)
+			if actual != expected:
+				print 'MISMATCH at ' + str(size) + ': ' + str(actual) + ' != ' + str(expected)
+				sys.exit(1)
+			rows = target.row_scores(image)
+			if int(target.row_scores(image, size[1] / 2).sum()) != int(rows[size[1] / 2:].sum()):
+				print 'MISMATCH at ' + str(size) + ': banded row scores differ from the full pass'
+				sys.exit(1)
+			if target.row_scores(image, limit=expected - 1) is not None or (target.row_scores(image, limit=expected) != rows).any():
+				print 'MISMATCH at ' + str(size) + ': bounded row scores differ from the full pass'
+				sys.exit(1)
+		shared = Target(shared=target.share())
+		if shared.score(image) != target.score(image):
+			print 'MISMATCH at ' + str(size) + ': shared target scores differently'
+			sys.exit(1)
+		for tile in (1, 4, 5):
+			if int(target.tile_errors(image, tile).sum()) != target.score(image):
+				print 'MISMATCH at ' + str(size) + ': tile errors do not sum to the score'
+				sys.exit(1)
+		errors = target.pixel_errors(image)
+		box = (size[0] / 3, size[1] / 4, size[0] - size[0] / 4, size[1])
+		if int(errors.sum()) != target.score(image) or (target.box_scores(image.crop(box), box) != box_rows(errors, box)).any():
+			print 'MISMATCH at ' + str(size) + ': box scores differ from the pixel errors'
+			sys.exit(1)
+		overlay = random_image(size).convert('RGBA')
+		overlay.putalpha(random_image(size).convert('L'))
+		pasted = image.copy()
+		pasted.paste(overlay, (0, 0), overlay)
+		data = numpy.asarray(overlay, dtype=numpy.int32)
+		if (blend(numpy.asarray(image, dtype=numpy.int32), data[:, :, :3], data[:, :, 3:]) != numpy.asarray(pasted)).any():
+			print 'MISMATCH at ' + str(size) + ': blend differs from Image.paste'
+			sys.exit(1)
+		importance = random_image(size).convert('L')
+		for name in sorted(metric.METRICS):
+			measure = metric.METRICS[name]
+			weighted = Target(target_image, measure=measure, importance=importance)
+			errors = (measure.convert(numpy.asarray(image)).astype(numpy.int64) - measure.convert(numpy.asarray(target_image))) ** 2
+			if measure.weights != None:
+				errors *= measure.weights
+			expected = int((errors.sum(axis=2) * numpy.asarray(importance)).sum())
+			if weighted.score(image) != expected or Target(shared=weighted.share()).score(image) != expected or int(weighted.pixel_errors(image).sum()) != expected:
+				print 'MISMATCH at ' + str(size) + ': ' + name + ' scores differ from converting each image whole'
+				sys.exit(1)
+		if target.score(target_image) != 0:
+			print 'MISMATCH at ' + str(size) + ': target does not score 0 against itself'
+			sys.exit(1)
+	memo = ScoreCache(2)
+	dna = [genome.Genome([((1, 2, 3, 4), [index, index])]) for index in range(3)]
+	memo.store(dna[0], 10)
+	memo.store(dna[1], None, 20)
+	if memo.lookup(dna[0]) != (True, 10) or memo.lookup(dna[0], 9) != (True, None) or memo.lookup(dna[1], 20) != (True, None) or memo.lookup(dna[1], 21)[0] or memo.lookup(dna[1])[0]:
+		print 'MISMATCH: score cache answers differ from calc_score'
+		sys.exit(1)
+	memo.store(dna[2], 30)
+	if memo.lookup(dna[0])[0] or memo.hits != 3 or memo.misses != 3:
+		print 'MISMATCH: score cache does not evict its least recently used entry'
+		sys.exit(1)
+	print 'Target.score matches the reference loop.'
+	# The engine imports this module, so it is only imported to check organisms against it.
+	import engine
+	size = (40, 30)
+	target_image = random_image(size)
+	for name in sorted(shapes.SHAPES):
+		for measure in ('rgb', 'lab'):
+			config = engine.default_config(name)
+			config['METRIC'] = measure
+			target = Target(target_image, measure=metric.METRICS[measure])
+			current = engine.ImageOrganism(config, size, genome.Genome()).add_shape(target)
+			current.calc_score(target)
+			nc = 0
+			for trial in range(CHAIN_LENGTH):
+				candidate = engine.make_candidate(current, nc, config, target=target)
+				bound = random.choice((None, current.score))
+				score = candidate.calc_score(target, bound)
+				fresh = engine.ImageOrganism(config, size, candidate.dna)
+				expected = fresh.calc_score(target)
+				if score != expected and (score != None or expected <= bound):
+					print 'MISMATCH for ' + name + ' under ' + measure + ': incremental score ' + str(score) + ' != ' + str(expected)
+					sys.exit(1)
+				# Worse candidates are accepted now and then too, so chains of derived organisms cover every mutation.
+				if score == None or (score >= current.score and random.random() < 0.7):
+					nc += 1
+					continue
+				if (numpy.asarray(candidate.image) != numpy.asarray(fresh.image)).any():
+					print 'MISMATCH for ' + name + ' under ' + measure + ': incremental image differs from a full render'
+					sys.exit(1)
+				current = candidate
+				nc = 0
+	print 'Incremental scores and images match full renders.'
+	importance = random_image(size).convert('L')
+	for name in sorted(shapes.SHAPES):
+		for measure in ('rgb', 'hsl'):
+			config = engine.default_config(name)
+			config['METRIC'] = measure
+			target = Target(target_image, measure=metric.METRICS[measure], importance=importance)
+			organism = engine.ImageOrganism(config, size, genome.Genome())
+			for index in range(8):
+				organism = organism.add_shape()
+			organism.calc_score(target)
+			for trial in range(20):
+				which_dna = random.randint(0, len(organism.dna) - 1)
+				colors = [shapes.SHAPES[name].random_color() for index in range(4)]
+				for color, score in zip(colors, organism.color_scores(target, which_dna, colors)):
+					if engine.ImageOrganism(config, size, organism.dna.set_color(which_dna, color)).calc_score(target) != score:
+						print 'MISMATCH for ' + name + ' under ' + measure + ': colour variant scores differ from full renders'
+						sys.exit(1)
+	print 'Colour variant scores match full renders.'
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
@@ -0,0 +1,133 @@
+#!/usr/bin/python
+
+import array
+import struct
+
+class Genome:
+	"""A compact DNA string of (r, g, b, a) colours and integer coordinates in typed arrays, never modified in place; each edit returns a new Genome."""
+
+	def __init__(self, shapes=(), arrays=None):
+		if arrays != None:
+			self.__colors, self.__coords, self.__offsets = arrays
+			return
+		self.__colors = array.array('B')
+		self.__coords = array.array('i')
+		self.__offsets = array.array('i', [0])
+		for shape in shapes:
+			self.__colors.extend(shape[0])
+			self.__coords.extend(shape[1])
+			self.__offsets.append(len(self.__coords))
+
+	def __len__(self):
+		return len(self.__offsets) - 1
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return [self[i] for i in range(*index.indices(len(self)))]
+		if index < 0:
+			index += len(self)
+		if index < 0 or index >= len(self):
+			raise IndexError('genome index out of range')
+		return (self.color(index), self.coords(index))
+
+	def __repr__(self):
+		return repr(self.tolist())
+
+	def color(self, index):
+		return tuple(self.__colors[index * 4:index * 4 + 4])
+
+	def coords(self, index):
+		return self.__coords[self.__offsets[index]:self.__offsets[index + 1]].tolist()
+
+	def tolist(self):
+		return [self[index] for index in range(len(self))]
+
+	def key(self, stop):
+		"""Returns a string which identifies the shapes in [0, stop) by value."""
+		return self.__colors[:stop * 4].tostring() + self.__offsets[:stop + 1].tostring() + self.__coords[:self.__offsets[stop]].tostring()
+
+	def tostring(self):
+		"""Returns the whole genome as a string which fromstring() reads back."""
+		return struct.pack('=i', len(self)) + self.key(len(self))
+
+	def set_color(self, index, color):
+		colors = array.array('B', self.__colors)
+		colors[index * 4:index * 4 + 4] = array.array('B', color)
+		return Genome(arrays=(colors, self.__coords, self.__offsets))
+
+	def set_coord(self, index, which, value):
+		coords = array.array('i', self.__coords)
+		coords[self.__offsets[index] + which] = value
+		return Genome(arrays=(self.__colors, coords, self.__offsets))
+
+	def set_coords(self, index, values):
+		start = self.__offsets[index]
+		stop = self.__offsets[index + 1]
+		if len(values) != stop - start:
+			return self.__splice(index, index + 1, [(self.color(index), values)])
+		coords = array.array('i', self.__coords)
+		coords[start:stop] = array.array('i', values)
+		return Genome(arrays=(self.__colors, coords, self.__offsets))
+
+	def scale(self, factor, primitive):
+		"""Returns a new Genome with each shape's coordinates scaled up by factor, as primitive.scale() scales them."""
+		coords = array.array('i')
+		for index in range(len(self)):
+			coords.extend(primitive.scale(self.coords(index), factor))
+		return Genome(arrays=(self.__colors, coords, self.__offsets))
+
+	def swap(self, first, second):
+		if first > second:
+			first, second = second, first
+		if self.__offsets[first + 1] - self.__offsets[first] != self.__offsets[second + 1] - self.__offsets[second]:
+			return self.__splice(first, second + 1, [self[second]] + self[first + 1:second] + [self[first]])
+		colors = array.array('B', self.__colors)
+		colors[first * 4:first * 4 + 4] = self.__colors[second * 4:second * 4 + 4]
+		colors[second * 4:second * 4 + 4] = self.__colors[first * 4:first * 4 + 4]
+		coords = array.array('i', self.__coords)
+		coords[self.__offsets[first]:self.__offsets[first + 1]] = self.__coords[self.__offsets[second]:self.__offsets[second + 1]]
+		coords[self.__offsets[second]:self.__offsets[second + 1]] = self.__coords[self.__offsets[first]:self.__offsets[first + 1]]
+		return Genome(arrays=(colors, coords, self.__offsets))
+
+	def join(self, head, other, tail):
+		"""Returns a new Genome of this genome's shapes in [0, head) followed by other's shapes from tail on."""
+		colors = self.__colors[:head * 4] + other.__colors[tail * 4:]
+		coords = self.__coords[:self.__offsets[head]] + other.__coords[other.__offsets[tail]:]
+		delta = self.__offsets[head] - other.__offsets[tail]
+		offsets = self.__offsets[:head + 1] + array.array('i', [offset + delta for offset in other.__offsets[tail + 1:]])
+		return Genome(arrays=(colors, coords, offsets))
+
+	def delete(self, index):
+		return self.__splice(index, index + 1, [])
+
+	def insert(self, index, shape):
+		return self.__splice(index, index, [shape])
+
+	def append(self, shape):
+		return self.__splice(len(self), len(self), [shape])
+
+	def __splice(self, start, stop, shapes):
+		"""Returns a new Genome with the shapes in [start, stop) replaced by shapes."""
+		colors = self.__colors[:start * 4]
+		coords = self.__coords[:self.__offsets[start]]
+		offsets = self.__offsets[:start + 1]
+		for shape in shapes:
+			colors.extend(shape[0])
+			coords.extend(shape[1])
+			offsets.append(len(coords))
+		delta = len(coords) - self.__offsets[stop]
+		colors.extend(self.__colors[stop * 4:])
+		coords.extend(self.__coords[self.__offsets[stop]:])
+		offsets.extend(array.array('i', [offset + delta for offset in self.__offsets[stop + 1:]]))
+		return Genome(arrays=(colors, coords, offsets))
+
+def fromstring(data):
+	"""Returns the Genome which Genome.tostring() wrote as data."""
+	count = struct.unpack('=i', data[:4])[0]
+	size = array.array('i').itemsize
+	offsets_start = 4 + count * 4
+	coords_start = offsets_start + (count + 1) * size
+	colors = array.array('B', data[4:offsets_start])
+	offsets = array.array('i', data[offsets_start:coords_start])
+	coords = array.array('i', data[coords_start:])
+	return Genome(arrays=(colors, coords, offsets))
@@ -0,0 +1,57 @@
+#!/usr/bin/python
+
+import os
+import struct
+
+import genome
+
+# Length of the DNA which follows, generation, score, iteration, number of shapes.
+HEADER = struct.Struct('=Iiqqi')
+
+class HistoryLog:
+	"""An append-only log of accepted generations, indexed by record offsets so that neither appending nor resuming grows with the length of the run."""
+
+	def __init__(self, path):
+		self.__index = {}
+		self.__file = open(path, 'a+b')
+		end = os.fstat(self.__file.fileno()).st_size
+		offset = 0
+		while offset + HEADER.size <= end:
+			self.__file.seek(offset)
+			length, generation, score, x, shapes = HEADER.unpack(self.__file.read(HEADER.size))
+			if offset + HEADER.size + length > end:
+				break
+			self.__index[generation] = (offset, score, x, shapes)
+			offset += HEADER.size + length
+		if offset != end:
+			self.__file.truncate(offset)
+
+	def __contains__(self, generation):
+		return generation in self.__index
+
+	def generations(self):
+		return sorted(self.__index)
+
+	def entry(self, generation):
+		"""Returns (score, iteration, shapes) of a generation, or None if it was never logged."""
+		record = self.__index.get(generation)
+		if record == None:
+			return None
+		return record[1:]
+
+	def dna(self, generation):
+		offset = self.__index[generation][0]
+		self.__file.seek(offset)
+		length = HEADER.unpack(self.__file.read(HEADER.size))[0]
+		return genome.fromstring(self.__file.read(length))
+
+	def append(self, generation, score, x, dna):
+		data = dna.tostring()
+		self.__file.seek(0, 2)
+		offset = self.__file.tell()
+		self.__file.write(HEADER.pack(len(data), generation, score, x, len(dna)) + data)
+		self.__file.flush()
+		self.__index[generation] = (offset, score, x, len(dna))
+
+	def close(self):
+		self.__file.close()
@@ -0,0 +1,156 @@
+#!/usr/bin/python
+
+import numpy
+import random
+import sys
+
+class Metric:
+	"""A fitness metric: the weighted squared difference of each channel of each pixel, in a colour space which convert() maps RGB pixels into as bytes."""
+
+	# Whether convert() does anything, and so whether the target's converted pixels are worth keeping.
+	converts = False
+	weights = None
+
+	def convert(self, pixels):
+		"""Returns (..., 3) RGB pixels, of any integer type holding 0-255, in the metric's space as a uint8 array of the same shape."""
+		return pixels
+
+class RGB(Metric):
+	"""Squared error of the red, green and blue channels, the original fitness."""
+
+class Luma(Metric):
+	"""Squared error of the RGB channels weighted by their share of luma (Rec. 601, in thousandths), so green costs the most."""
+
+	weights = (299, 587, 114)
+
+class HSL(Metric):
+	"""Squared distance in the HSL cylinder, with hue as an angle on the colour wheel so that the distance wraps round at red, each coordinate scaled to a byte."""
+
+	converts = True
+
+	def convert(self, pixels):
+		rgb = pixels.astype(numpy.float32) / 255
+		red, green, blue = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+		# Reducing over a trailing axis of three is far slower than comparing the channels pairwise.
+		maximum = numpy.maximum(numpy.maximum(red, green), blue)
+		minimum = numpy.minimum(numpy.minimum(red, green), blue)
+		chroma = maximum - minimum
+		lightness = (maximum + minimum) / 2
+		saturation = chroma / numpy.maximum(1 - numpy.abs(2 * lightness - 1), 1e-6)
+		# The hue in sixths of a turn, from the largest channel's sector; cos and sin need it in no particular turn.
+		sector = numpy.where(maximum == red, green - blue, numpy.where(maximum == green, blue - red + 2 * chroma, red - green + 4 * chroma))
+		hue = sector / numpy.maximum(chroma, 1e-6) * (numpy.pi / 3)
+		result = numpy.empty(pixels.shape, dtype=numpy.uint8)
+		result[..., 0] = numpy.rint(127.5 + 127.5 * saturation * numpy.cos(hue))
+		result[..., 1] = numpy.rint(127.5 + 127.5 * saturation * numpy.sin(hue))
+		result[..., 2] = numpy.rint(255 * lightness)
+		return result
+
+# sRGB's transfer function, as a table indexed by the byte value of a channel.
+LINEAR = numpy.array([value / 12.92 if value <= 0.04045 else ((value + 0.055) / 1.055) ** 2.4 for value in numpy.arange(256) / 255.0], dtype=numpy.float32)
+
+# Linear sRGB to CIE XYZ, each row divided by the D65 white point's component, transposed to multiply rows of pixels.
+XYZ = (numpy.array([
+	[0.4124, 0.3576, 0.1805],
+	[0.2126, 0.7152, 0.0722],
+	[0.0193, 0.1192, 0.9505]]) / numpy.array([[0.95047], [1.0], [1.08883]])).T.astype(numpy.float32)
+
+# f(X), f(Y), f(Z) to the bytes of L* scaled by 2.55, a* and b*, which are linear in them, before OFFSET is added. OFFSET includes a half so truncating rounds.
+LAB = numpy.array([
+	[0.0, 500.0, 0.0],
+	[2.55 * 116, -500.0, 200.0],
+	[0.0, 0.0, -200.0]], dtype=numpy.float32)
+OFFSET = numpy.array([-2.55 * 16 + 0.5, 128.5, 128.5], dtype=numpy.float32)
+
+class Lab(Metric):
+	"""Squared CIE76 colour difference in CIELAB, stored as bytes and weighted back, so a score is about 13 times the sum of squared delta E."""
+
+	converts = True
+	weights = (2, 13, 13)
+
+	def convert(self, pixels):
+		# Matrix products of 2-d arrays go through BLAS; of higher ones, a slow generic loop.
+		xyz = numpy.dot(numpy.take(LINEAR, pixels).reshape(-1, 3), XYZ)
+		f = numpy.cbrt(xyz)
+		dark = xyz <= (6 / 29.0) ** 3
+		if dark.any():
+			f[dark] = xyz[dark] / (3 * (6 / 29.0) ** 2) + 4 / 29.0
+		lab = numpy.dot(f, LAB)
+		lab += OFFSET
+		numpy.clip(lab, 0, 255, out=lab)
+		return lab.astype(numpy.uint8).reshape(pixels.shape)
+
+METRICS = {
+	'rgb': RGB(),
+	'luma': Luma(),
+	'hsl': HSL(),
+	'lab': Lab(),
+}
+
+def rgb_to_hsl(rgb):
+	"""The original per-pixel HSL conversion, kept as the reference for HSL.convert. Returns (hue, saturation, lightness), each in [0, 1]."""
+	norm_rgb = (rgb[0] / 255.0, rgb[1] / 255.0, rgb[2] / 255.0)
+	maximum = max(norm_rgb)
+	minimum = min(norm_rgb)
+	l = (maximum + minimum) / 2.0
+	if maximum == minimum:
+		s = 0
+	elif l <= 0.5:
+		s = (maximum - minimum) / (2 * l)
+	else:
+		s = (maximum - minimum) / (2 - 2 * l)
+	if maximum == minimum:
+		h = 0
+	elif maximum == norm_rgb[0]:
+		h = (60 * (norm_rgb[1] - norm_rgb[2]) / (maximum - minimum)) % 360
+	elif maximum == norm_rgb[1]:
+		h = 60 * (norm_rgb[2] - norm_rgb[0]) / (maximum - minimum) + 120
+	elif maximum == norm_rgb[2]:
+		h = 60 * (norm_rgb[0] - norm_rgb[1]) / (maximum - minimum) + 240
+	return (h / 360.0, s, l)
+
+def rgb_to_lab(rgb):
+	"""A per-pixel CIELAB conversion, the reference for Lab.convert. Returns (L*, a*, b*)."""
+	linear = []
+	for value in rgb:
+		value /= 255.0
+		if value <= 0.04045:
+			linear.append(value / 12.92)
+		else:
+			linear.append(((value + 0.055) / 1.055) ** 2.4)
+	white = (0.95047, 1.0, 1.08883)
+	rows = ((0.4124, 0.3576, 0.1805), (0.2126, 0.7152, 0.0722), (0.0193, 0.1192, 0.9505))
+	f = []
+	for index in range(3):
+		t = sum([rows[index][band] * linear[band] for band in range(3)]) / white[index]
+		if t > (6 / 29.0) ** 3:
+			f.append(t ** (1 / 3.0))
+		else:
+			f.append(t / (3 * (6 / 29.0) ** 2) + 4 / 29.0)
+	return (116 * f[1] - 16, 500 * (f[0] - f[1]), 200 * (f[1] - f[2]))
+
+def main(argv):
+	random.seed(0)
+	colors = [(random.randint(0, 255), random.randint(0, 255), random.randint(0, 255)) for index in range(2000)]
+	colors += [(value, value, value) for value in range(256)] + [(255, 0, 0), (254, 0, 1), (255, 1, 0)]
+	pixels = numpy.array(colors, dtype=numpy.uint8)
+	hsl = METRICS['hsl'].convert(pixels).astype(numpy.float64)
+	lab = METRICS['lab'].convert(pixels).astype(numpy.float64)
+	for index in range(len(colors)):
+		h, s, l = rgb_to_hsl(colors[index])
+		expected = (127.5 + 127.5 * s * numpy.cos(2 * numpy.pi * h), 127.5 + 127.5 * s * numpy.sin(2 * numpy.pi * h), 255 * l)
+		if numpy.abs(hsl[index] - expected).max() > 1:
+			print 'MISMATCH for HSL of ' + str(colors[index]) + ': ' + str(hsl[index]) + ' != ' + str(expected)
+			sys.exit(1)
+		L, a, b = rgb_to_lab(colors[index])
+		expected = (min(max(2.55 * L, 0), 255), min(max(128 + a, 0), 255), min(max(128 + b, 0), 255))
+		if numpy.abs(lab[index] - expected).max() > 1:
+			print 'MISMATCH for Lab of ' + str(colors[index]) + ': ' + str(lab[index]) + ' != ' + str(expected)
+			sys.exit(1)
+	if numpy.abs(hsl[-2] - hsl[-1]).max() > 2:
+		print 'MISMATCH: HSL does not wrap round at red'
+		sys.exit(1)
+	print 'Vectorized conversions match the per-pixel references.'
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
@@ -0,0 +1,48 @@
+#!/usr/bin/python
+
+import random
+
+class Population:
+	"""A generational genetic algorithm, with tournament selection and an elite, over organisms which provide crossover(other)."""
+
+	def __init__(self, members, scores, config):
+		self.__size = config['POPULATION']
+		# At least one child is bred each generation, however small the population.
+		self.__elite = min(config['ELITE'], self.__size - 1)
+		self.__tournament = config['TOURNAMENT']
+		self.__crossover_rate = config['CROSSOVER_RATE']
+		self.__members = []
+		self.__merge(zip(scores, members))
+
+	def __get_best(self):
+		return self.__members[0]
+
+	def __get_size(self):
+		return self.__size
+
+	best = property(fget=__get_best, doc="""(score, organism) of the fittest member.""")
+	size = property(fget=__get_size, doc="""Number of members kept each generation.""")
+
+	def __merge(self, scored):
+		members = self.__members + list(scored)
+		members.sort(key=lambda member: member[0])
+		self.__members = members[:self.__size]
+
+	def __select(self):
+		contestants = random.sample(self.__members, min(self.__tournament, len(self.__members)))
+		return min(contestants, key=lambda member: member[0])[1]
+
+	def breed(self, vary):
+		"""Returns the next generation's children: tournament winners, crossed over with a second at CROSSOVER_RATE, then passed through vary(organism, index)."""
+		children = []
+		while len(children) < self.__size - self.__elite:
+			child = self.__select()
+			if random.random() < self.__crossover_rate:
+				child = child.crossover(self.__select())
+			children.append(vary(child, len(children)))
+		return children
+
+	def advance(self, children, scores):
+		"""Replaces all but the elite with the fittest of the scored children."""
+		self.__members = self.__members[:self.__elite]
+		self.__merge(zip(scores, children))
@@ -0,0 +1,45 @@
+#!/usr/bin/python
+
+import collections
+
+class LayerCache:
+	"""A bounded LRU cache of composites every `interval` layers, keyed on the value of the genome prefix beneath them."""
+
+	def __init__(self, interval, capacity):
+		self.__interval = interval
+		self.__capacity = capacity
+		self.__entries = collections.OrderedDict()
+
+	def __get_interval(self):
+		return self.__interval
+
+	interval = property(fget=__get_interval, doc="""Number of layers between checkpoints.""")
+
+	def get(self, dna, index):
+		"""Returns the composite of dna[:index], or None if it is not cached."""
+		key = dna.key(index)
+		image = self.__entries.pop(key, None)
+		if image == None:
+			return None
+		self.__entries[key] = image
+		return image
+
+	def lookup(self, dna, limit):
+		"""Returns (index, image) for the deepest cached checkpoint at or below limit, or (0, None)."""
+		index = limit - limit % self.__interval
+		while index > 0:
+			image = self.get(dna, index)
+			if image != None:
+				return index, image
+			index -= self.__interval
+		return 0, None
+
+	def store(self, dna, index, image):
+		"""Caches image as the composite of dna[:index]."""
+		if self.__capacity <= 0:
+			return
+		key = dna.key(index)
+		self.__entries.pop(key, None)
+		self.__entries[key] = image
+		while len(self.__entries) > self.__capacity:
+			self.__entries.popitem(last=False)
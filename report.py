@@ -0,0 +1,80 @@
+#!/usr/bin/python
+
+import json
+import os
+import time
+
+import writer
+
+# Seconds between rewrites of the rows file to drop superseded rows.
+COMPACT_INTERVAL = 60.0
+
+PAGE = '''<html><style><!-- body {font-family: sans; } img { border: 1px dashed #7f7f7f; } td { font-size: 10pt; padding: 5px; } --> </style><body><table cellspacing='0' cellpadding='0' id='rows'></table>
+<script>
+var rows = {};
+function row(key, images, fields) { rows[key] = [images, fields]; }
+</script>
+<script src='%s'></script>
+<script>
+var keys = [];
+for (var key in rows)
+	keys.push(Number(key));
+keys.sort(function(a, b) { return a - b; });
+var html = [];
+for (var i = 0; i < keys.length; i++) {
+	var images = rows[keys[i]][0], fields = rows[keys[i]][1];
+	html.push('<tr>');
+	for (var j = 0; j < images.length; j++)
+		html.push('<td><img src=\\'' + images[j] + '\\' /></td>');
+	if (fields.length > 0) {
+		html.push('<td>');
+		for (var j = 0; j < fields.length; j++)
+			html.push('<b>' + fields[j][0] + ':</b> ' + fields[j][1] + '<br />');
+		html.push('</td>');
+	}
+	html.push('</tr>');
+}
+document.getElementById('rows').innerHTML = html.join('');
+</script></body></html>
+'''
+
+class Report:
+	"""An HTML report of one row per key, whose rows are appended to a script beside the static page so adding one costs the same however many there are."""
+
+	def __init__(self, page='index.html', rows='rows.js', interval=COMPACT_INTERVAL):
+		self.__rows_path = rows
+		self.__interval = interval
+		self.__rows = {}
+		self.__lines = 0
+		self.__compacted = time.time()
+		if os.path.exists(rows):
+			f = open(rows, 'r')
+			for line in f:
+				if line.startswith('row(') and line.endswith(');\n'):
+					args = json.loads('[' + line[4:-3] + ']')
+					self.__rows[args[0]] = line
+					self.__lines += 1
+			f.close()
+		writer.replace(page, lambda f: f.write(PAGE % rows), 'w')
+
+	def __len__(self):
+		return len(self.__rows)
+
+	def add(self, key, images, fields):
+		"""Adds a row of images followed by a cell of (label, value) fields."""
+		line = 'row(' + json.dumps(key) + ', ' + json.dumps(images) + ', ' + json.dumps(fields) + ');\n'
+		self.__rows[key] = line
+		self.__lines += 1
+		if self.__lines > 2 * len(self.__rows) and time.time() - self.__compacted >= self.__interval:
+			self.compact()
+			return
+		f = open(self.__rows_path, 'a')
+		f.write(line)
+		f.close()
+
+	def compact(self):
+		"""Rewrites the rows file with only the latest row of each key."""
+		keys = sorted(self.__rows)
+		writer.replace(self.__rows_path, lambda f: f.writelines([self.__rows[key] for key in keys]), 'w')
+		self.__lines = len(keys)
+		self.__compacted = time.time()
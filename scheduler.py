@@ -0,0 +1,59 @@
+#!/usr/bin/python
+
+import random
+
+class Scheduler:
+	"""Chooses mutations in proportion to their recent improvement of the score per second spent making and scoring them, with a `floor` fraction spread uniformly."""
+
+	def __init__(self, names, config, state=None):
+		self.__names = tuple(names)
+		self.__floor = config['SCHEDULE_FLOOR']
+		self.__decay = config['SCHEDULE_DECAY']
+		self.__timed = config['SCHEDULE_TIMED']
+		self.__rewards = [0.0] * len(self.__names)
+		self.__costs = [0.0] * len(self.__names)
+		if state != None:
+			for index in range(len(self.__names)):
+				if self.__names[index] in state:
+					self.__rewards[index], self.__costs[index] = state[self.__names[index]]
+
+	def state(self):
+		state = {}
+		for index in range(len(self.__names)):
+			state[self.__names[index]] = [self.__rewards[index], self.__costs[index]]
+		return state
+
+	def weights(self):
+		"""Returns the probability of choosing each mutation, in order."""
+		values = []
+		for index in range(len(self.__names)):
+			if self.__costs[index] > 0:
+				values.append(self.__rewards[index] / self.__costs[index])
+			else:
+				values.append(0.0)
+		total = sum(values)
+		uniform = 1.0 / len(values)
+		if total <= 0:
+			return [uniform] * len(values)
+		return [self.__floor * uniform + (1 - self.__floor) * value / total for value in values]
+
+	def choose(self, count):
+		"""Returns the index of the next mutation to apply, of count."""
+		assert count == len(self.__names)
+		pick = random.random()
+		weights = self.weights()
+		for index in range(len(weights) - 1):
+			pick -= weights[index]
+			if pick < 0:
+				return index
+		return len(weights) - 1
+
+	def update(self, name, improvement, seconds):
+		"""Records that a candidate mutated by name improved the score by improvement in seconds, or one candidate if SCHEDULE_TIMED is off."""
+		if name not in self.__names:
+			return
+		index = self.__names.index(name)
+		if not self.__timed:
+			seconds = 1.0
+		self.__rewards[index] = self.__decay * self.__rewards[index] + (1 - self.__decay) * max(improvement, 0)
+		self.__costs[index] = self.__decay * self.__costs[index] + (1 - self.__decay) * seconds
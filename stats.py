@@ -0,0 +1,73 @@
+#!/usr/bin/python
+
+import json
+import locale
+import time
+
+import writer
+
+PHASES = ('mutate', 'render', 'score', 'accept', 'io')
+
+class Stats:
+	"""Running counters for the search, printed and saved as JSON by report() once every `interval` seconds."""
+
+	def __init__(self, path, interval, memo=None):
+		self.__path = path
+		self.__memo = memo
+		self.__interval = interval
+		self.__phases = dict((phase, 0.0) for phase in PHASES)
+		self.__tried = {}
+		self.__accepted = {}
+		self.__iterations = 0
+		self.__start = time.time()
+		self.__last = (self.__start, 0)
+
+	def __get_phases(self):
+		return dict(self.__phases)
+
+	phases = property(fget=__get_phases, doc="""Seconds spent in each phase so far.""")
+
+	# Each phase is only added to from one thread: io from the writer's, the rest from the main thread.
+	def add(self, phase, seconds):
+		self.__phases[phase] += seconds
+
+	def tried(self, mutation, count=1):
+		self.__tried[mutation] = self.__tried.get(mutation, 0) + count
+		self.__iterations += count
+
+	def accepted(self, mutation):
+		self.__accepted[mutation] = self.__accepted.get(mutation, 0) + 1
+
+	def report(self, now):
+		"""Prints and saves the counters if `interval` seconds have passed since they were last reported."""
+		if now - self.__last[0] < self.__interval:
+			return
+		elapsed = now - self.__start
+		rate = (self.__iterations - self.__last[1]) / (now - self.__last[0])
+		self.__last = (now, self.__iterations)
+		mutations = {}
+		for mutation in self.__tried:
+			mutations[mutation] = {'tried': self.__tried[mutation], 'accepted': self.__accepted.get(mutation, 0)}
+		print 'Stats: ' + locale.format('%d', rate, True) + ' it/s; ' + \
+			', '.join([phase + ' ' + '%.0f%%' % (100 * self.__phases[phase] / elapsed) for phase in PHASES]) + '; ' + \
+			', '.join([mutation + ' ' + str(mutations[mutation]['accepted']) + '/' + str(mutations[mutation]['tried']) for mutation in sorted(mutations)]) + \
+			self.__memo_summary()
+		state = {
+			'elapsed': elapsed,
+			'iterations': self.__iterations,
+			'iterations_per_second': self.__iterations / elapsed,
+			'recent_iterations_per_second': rate,
+			'phases': dict(self.__phases),
+			'mutations': mutations,
+		}
+		if self.__memo != None:
+			state['score_cache'] = {'hits': self.__memo.hits, 'misses': self.__memo.misses}
+		writer.replace(self.__path, lambda f: json.dump(state, f, indent=1, sort_keys=True), 'w')
+
+	def __memo_summary(self):
+		if self.__memo == None:
+			return ''
+		lookups = self.__memo.hits + self.__memo.misses
+		if lookups == 0:
+			return ''
+		return '; score cache ' + '%.0f%%' % (100.0 * self.__memo.hits / lookups) + ' hits'
@@ -0,0 +1,87 @@
+#!/usr/bin/python
+
+import os
+import threading
+
+class Writer:
+	"""Writes checkpoints on a background thread, folding a state submitted while another is pending into it with merge(old, new)."""
+
+	def __init__(self, write, merge):
+		self.__write = write
+		self.__merge = merge
+		self.__pending = None
+		self.__busy = False
+		self.__closed = False
+		self.__error = None
+		self.__lock = threading.Condition()
+		self.__thread = threading.Thread(target=self.__run)
+		self.__thread.setDaemon(True)
+		self.__thread.start()
+
+	def submit(self, state):
+		self.__lock.acquire()
+		try:
+			self.__raise()
+			if self.__pending != None:
+				state = self.__merge(self.__pending, state)
+			self.__pending = state
+			self.__lock.notify()
+		finally:
+			self.__lock.release()
+
+	def flush(self):
+		"""Blocks until every submitted state has been written."""
+		self.__lock.acquire()
+		try:
+			while self.__pending != None or self.__busy:
+				self.__lock.wait(0.1)
+				self.__raise()
+		finally:
+			self.__lock.release()
+
+	def close(self):
+		self.flush()
+		self.__lock.acquire()
+		try:
+			self.__closed = True
+			self.__lock.notify()
+		finally:
+			self.__lock.release()
+		self.__thread.join()
+
+	def __raise(self):
+		if self.__error != None:
+			error = self.__error
+			self.__error = None
+			raise error
+
+	def __run(self):
+		while True:
+			self.__lock.acquire()
+			try:
+				while self.__pending == None and not self.__closed:
+					self.__lock.wait()
+				if self.__pending == None:
+					return
+				state = self.__pending
+				self.__pending = None
+				self.__busy = True
+			finally:
+				self.__lock.release()
+			try:
+				self.__write(state)
+			except Exception, e:
+				self.__error = e
+			self.__lock.acquire()
+			self.__busy = False
+			self.__lock.notifyAll()
+			self.__lock.release()
+
+def replace(path, write, mode='wb'):
+	"""Atomically replaces path with whatever write(f) writes to a temporary file beside it."""
+	f = open(path + '.tmp', mode)
+	try:
+		write(f)
+	finally:
+		f.close()
+	os.rename(path + '.tmp', path)